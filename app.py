@@ -3,7 +3,9 @@ Streamlit RAG Application.
 Upload documents, chat with their content using LangGraph pipeline.
 """
 import os
+import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from pathlib import Path
 
@@ -11,10 +13,16 @@ from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import CHROMA_COLLECTION_NAME
-from rag.ingestion import OCRService, PDFLoader, ImageLoader, SemanticTextProcessor
+from config import CHROMA_COLLECTION_NAME, INGEST_WORKERS, STREAM_RESPONSES
+from rag.ingestion import OCRService, SemanticTextProcessor, load_file, SUPPORTED_SUFFIXES
 from rag.retriever import VectorStore
-from rag.graph import run_rag_query
+from rag.graph import run_rag_query, run_rag_query_stream, clear_response_cache, evict_workflow
+
+# Block size for copying uploads to disk
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Seconds between checks on background ingestion jobs
+INGEST_POLL_SECONDS = 1.0
 
 
 # =====================================================
@@ -29,7 +37,7 @@ st.set_page_config(
 # =====================================================
 # CUSTOM CSS
 # =====================================================
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -63,7 +71,34 @@ st.markdown("""
         font-weight: 600;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_resource
+def _inject_css():
+    """Emit the custom CSS (Streamlit replays the cached element on reruns)."""
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+# =====================================================
+# SHARED SERVICES
+# =====================================================
+@st.cache_resource
+def get_ocr_service() -> OCRService:
+    """Get the OCR service shared across sessions and reruns."""
+    return OCRService()
+
+
+@st.cache_resource
+def get_text_processor() -> SemanticTextProcessor:
+    """Get the text processor shared across sessions and reruns."""
+    return SemanticTextProcessor()
+
+
+@st.cache_resource
+def get_ingest_pool() -> ThreadPoolExecutor:
+    """Get the background pool that runs OCR + chunking off the script thread."""
+    return ThreadPoolExecutor(max_workers=INGEST_WORKERS)
 
 
 # =====================================================
@@ -71,6 +106,10 @@ st.markdown("""
 # =====================================================
 def init_session_state():
     """Initialize session state variables."""
+    if "ocr_service" not in st.session_state:
+        st.session_state.ocr_service = get_ocr_service()
+    if "text_processor" not in st.session_state:
+        st.session_state.text_processor = get_text_processor()
     if "messages" not in st.session_state:
         st.session_state.messages = []
     if "vector_store" not in st.session_state:
@@ -79,63 +118,106 @@ def init_session_state():
         st.session_state.documents_loaded = False
     if "doc_count" not in st.session_state:
         st.session_state.doc_count = 0
+    if "ingest_jobs" not in st.session_state:
+        st.session_state.ingest_jobs = []  # (file name, future) pairs
+    if "ingest_report" not in st.session_state:
+        st.session_state.ingest_report = []  # (success, message) pairs
+    if "ingest_index" not in st.session_state:
+        st.session_state.ingest_index = None  # Background indexing job, see start_indexing
 
 
 # =====================================================
 # DOCUMENT PROCESSING
 # =====================================================
-def process_uploaded_file(uploaded_file) -> tuple[bool, str, int]:
+def process_uploaded_file(
+    uploaded_file,
+    ocr_service: OCRService,
+    processor: SemanticTextProcessor
+) -> tuple[bool, str, list]:
     """
-    Process an uploaded file through the ingestion pipeline.
+    Run an uploaded file through OCR and chunking.
+    
+    Services are passed in rather than read from session state so this
+    can run on worker threads.
     
     Returns:
-        Tuple of (success, message, chunk_count)
+        Tuple of (success, message, documents)
     """
+    suffix = Path(uploaded_file.name).suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        return False, f"Unsupported file type: {suffix}", []
+    
     try:
-        # Initialize services
-        ocr_service = OCRService()
-        processor = SemanticTextProcessor()
-        
-        # Get or create vector store
-        if st.session_state.vector_store is None:
-            st.session_state.vector_store = VectorStore()
-        
         # Save uploaded file temporarily
-        suffix = Path(uploaded_file.name).suffix.lower()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
+        with tempfile.NamedTemporaryFile(
+            delete=False, suffix=suffix, buffering=COPY_BUFFER_SIZE
+        ) as tmp_file:
+            # Stream in 1 MiB blocks instead of materializing the whole upload
+            uploaded_file.seek(0)
+            shutil.copyfileobj(uploaded_file, tmp_file, length=COPY_BUFFER_SIZE)
             tmp_path = tmp_file.name
         
         try:
-            # Load document based on type
-            if suffix == ".pdf":
-                loader = PDFLoader(ocr_service=ocr_service)
-                raw_texts = loader.load(tmp_path)
-            elif suffix in [".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp"]:
-                loader = ImageLoader(ocr_service=ocr_service)
-                raw_texts = loader.load(tmp_path)
-            else:
-                return False, f"Unsupported file type: {suffix}", 0
-            
-            # Process into chunks
-            documents = processor.process(raw_texts, source=uploaded_file.name)
+            # Load and chunk with the same dispatch as batch ingestion
+            documents = load_file(tmp_path, ocr_service, processor, source=uploaded_file.name)
             
             if not documents:
-                return False, "No text content extracted from document", 0
-            
-            # Add to vector store
-            st.session_state.vector_store.add_documents(documents)
-            st.session_state.documents_loaded = True
-            st.session_state.doc_count += len(documents)
+                return False, "No text content extracted from document", []
             
-            return True, f"Successfully processed {uploaded_file.name}", len(documents)
+            return True, f"Successfully processed {uploaded_file.name}", documents
             
         finally:
             # Clean up temp file
             os.unlink(tmp_path)
             
     except Exception as e:
-        return False, f"Error processing file: {str(e)}", 0
+        return False, f"Error processing file: {str(e)}", []
+
+
+def index_documents(vector_store: VectorStore, documents: list, progress: list) -> tuple[bool, str]:
+    """
+    Add chunks from all processed files to the vector store in batches.
+    
+    Runs on the ingest pool, so it only touches the objects passed in;
+    `progress` is updated in place as [done, total] for the UI to poll.
+    
+    Returns:
+        Tuple of (success, message)
+    """
+    def on_progress(done: int, total: int):
+        progress[:] = [done, total]
+    
+    try:
+        vector_store.add_documents_batched(
+            documents,
+            batch_size=200,
+            progress_callback=on_progress,
+        )
+        clear_response_cache(vector_store)
+        return True, f"Indexed {len(documents)} chunks"
+        
+    except Exception as e:
+        return False, f"Error indexing documents: {str(e)}"
+
+
+def start_indexing(documents: list, report: list):
+    """Submit indexing of processed chunks to the background pool."""
+    # Get or create vector store; each session saves into its own
+    # directory, so sessions never load or overwrite each other's index
+    if st.session_state.vector_store is None:
+        st.session_state.vector_store = VectorStore(
+            persist_directory=tempfile.mkdtemp(prefix="rag_session_")
+        )
+    
+    progress = [0, len(documents)]
+    st.session_state.ingest_index = {
+        "future": get_ingest_pool().submit(
+            index_documents, st.session_state.vector_store, documents, progress
+        ),
+        "progress": progress,
+        "count": len(documents),
+        "report": report,
+    }
 
 
 def get_rag_response(question: str) -> tuple[str, list]:
@@ -157,6 +239,27 @@ def get_rag_response(question: str) -> tuple[str, list]:
         return f"Error generating response: {str(e)}", []
 
 
+def stream_rag_response(question: str, result: dict):
+    """
+    Stream a RAG response as text chunks for st.write_stream.
+    
+    The final state (including sources) is written into `result` once
+    the stream completes.
+    """
+    if st.session_state.vector_store is None:
+        yield "Please upload a document first."
+        return
+    
+    try:
+        for event in run_rag_query_stream(question, st.session_state.vector_store):
+            if "token" in event:
+                yield event["token"]
+            else:
+                result.update(event["final_state"])
+    except Exception as e:
+        yield f"Error generating response: {str(e)}"
+
+
 # =====================================================
 # UI COMPONENTS
 # =====================================================
@@ -169,31 +272,43 @@ def render_sidebar():
         # File uploader
         uploaded_files = st.file_uploader(
             "Choose files",
-            type=["pdf", "png", "jpg", "jpeg", "webp"],
+            type=[suffix.lstrip(".") for suffix in SUPPORTED_SUFFIXES],
             accept_multiple_files=True,
             help="Upload PDF documents or images for OCR processing"
         )
         
-        # Process button
+        # Process button: OCR + chunking run on the background pool so
+        # the UI stays responsive; render_ingest_status polls for results
         if uploaded_files:
-            if st.button("🚀 Process Documents", type="primary", use_container_width=True):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                total_chunks = 0
-                for i, file in enumerate(uploaded_files):
-                    status_text.text(f"Processing {file.name}...")
-                    success, message, chunks = process_uploaded_file(file)
-                    
-                    if success:
-                        total_chunks += chunks
-                        st.success(f"✓ {file.name}: {chunks} chunks")
-                    else:
-                        st.error(f"✗ {file.name}: {message}")
-                    
-                    progress_bar.progress((i + 1) / len(uploaded_files))
-                
-                status_text.text(f"Done! Total: {total_chunks} chunks indexed")
+            if st.button(
+                "🚀 Process Documents",
+                type="primary",
+                use_container_width=True,
+                disabled=bool(st.session_state.ingest_jobs or st.session_state.ingest_index),
+            ):
+                pool = get_ingest_pool()
+                st.session_state.ingest_report = []
+                st.session_state.ingest_jobs = [
+                    (
+                        file.name,
+                        pool.submit(
+                            process_uploaded_file,
+                            file,
+                            st.session_state.ocr_service,
+                            st.session_state.text_processor,
+                        ),
+                    )
+                    for file in uploaded_files
+                ]
+        
+        if st.session_state.ingest_jobs or st.session_state.ingest_index:
+            render_ingest_status()
+        else:
+            for success, message in st.session_state.ingest_report:
+                if success:
+                    st.success(message)
+                else:
+                    st.error(message)
         
         # Stats
         st.markdown("---")
@@ -211,15 +326,94 @@ def render_sidebar():
         # Clear button
         if st.session_state.documents_loaded:
             st.markdown("---")
-            if st.button("🗑️ Clear All Documents", use_container_width=True):
+            if st.button(
+                "🗑️ Clear All Documents",
+                use_container_width=True,
+                disabled=bool(st.session_state.ingest_index),
+            ):
                 if st.session_state.vector_store:
                     st.session_state.vector_store.clear()
+                    evict_workflow(st.session_state.vector_store)
                 st.session_state.messages = []
                 st.session_state.documents_loaded = False
                 st.session_state.doc_count = 0
                 st.rerun()
 
 
+@st.fragment(run_every=INGEST_POLL_SECONDS)
+def render_ingest_status():
+    """
+    Show progress of background ingestion jobs.
+    
+    Runs as a fragment, so only this block reruns on each poll. Once every
+    file is done, indexing is submitted as another background job; when
+    that finishes, the results are recorded and the full app reruns.
+    """
+    index_job = st.session_state.ingest_index
+    if index_job is not None:
+        render_index_status(index_job)
+        return
+    
+    jobs = st.session_state.ingest_jobs
+    if not jobs:
+        return
+    
+    done = sum(future.done() for _, future in jobs)
+    st.progress(done / len(jobs))
+    
+    if done < len(jobs):
+        st.text(f"Processing files... {done}/{len(jobs)}")
+        return
+    
+    # Collect results in upload order
+    report = []
+    all_chunks = []
+    for name, future in jobs:
+        success, message, documents = future.result()
+        if success:
+            all_chunks.extend(documents)
+            report.append((True, f"✓ {name}: {len(documents)} chunks"))
+        else:
+            report.append((False, f"✗ {name}: {message}"))
+    
+    # Then index all chunks together, batch by batch, off the script
+    # thread so a rerun cannot interrupt it halfway
+    if all_chunks:
+        start_indexing(all_chunks, report)
+        st.session_state.ingest_jobs = []
+        st.text(f"Indexing {len(all_chunks)} chunks...")
+        return
+    
+    st.session_state.ingest_jobs = []
+    report.append((True, "Done! Total: 0 chunks indexed"))
+    st.session_state.ingest_report = report
+    st.rerun()
+
+
+def render_index_status(index_job: dict):
+    """Show indexing progress, and record the outcome once it finishes."""
+    done, total = index_job["progress"]
+    if not index_job["future"].done():
+        st.progress(done / total if total else 0.0)
+        st.text(f"Indexing {total} chunks... {done}/{total}")
+        return
+    
+    report = index_job["report"]
+    success, message = index_job["future"].result()
+    total_chunks = 0
+    if success:
+        total_chunks = index_job["count"]
+        st.session_state.documents_loaded = True
+        st.session_state.doc_count += total_chunks
+    else:
+        report.append((False, f"✗ {message}"))
+    
+    report.append((True, f"Done! Total: {total_chunks} chunks indexed"))
+    st.session_state.ingest_report = report
+    st.session_state.ingest_index = None
+    st.rerun()
+
+
 def render_chat():
     """Render the main chat interface."""
     # Header
@@ -247,11 +441,15 @@ def render_chat():
             if not st.session_state.documents_loaded:
                 response = "Please upload and process a document first using the sidebar."
                 sources = []
+                st.markdown(response)
+            elif STREAM_RESPONSES:
+                result = {}
+                response = st.write_stream(stream_rag_response(prompt, result))
+                sources = result.get("sources", [])
             else:
                 with st.spinner("Thinking..."):
                     response, sources = get_rag_response(prompt)
-            
-            st.markdown(response)
+                st.markdown(response)
             
             if sources:
                 with st.expander("📎 Sources"):
@@ -271,6 +469,7 @@ def render_chat():
 # =====================================================
 def main():
     """Main application entry point."""
+    _inject_css()
     init_session_state()
     render_sidebar()
     render_chat()
@@ -26,17 +26,58 @@ TEMPERATURE = float(os.getenv("TEMPERATURE", "0.0"))
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 
+# ===================================================
+# LOCAL DATA
+# ===================================================
+CACHE_DIR = os.getenv("CACHE_DIR", "./.cache")  # OCR and embedding caches
+
+# ===================================================
+# INGESTION
+# ===================================================
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))  # Files processed concurrently
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", str(min(os.cpu_count() or 1, 4))))  # Pages OCR'd concurrently
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))  # Pages per OCR batch request
+PDF_DPI = int(os.getenv("PDF_DPI", "150"))  # Rasterization resolution for PDF OCR
+PDF_GRAYSCALE = os.getenv("PDF_GRAYSCALE", "true").lower() in ("1", "true", "yes")  # Render pages in grayscale
+USE_OCR_CACHE = os.getenv("USE_OCR_CACHE", "true").lower() in ("1", "true", "yes")  # Skip re-OCR of seen pages
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(CACHE_DIR, "ocr_cache.sqlite3"))
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))  # Results kept in memory
+
 # ===================================================
 # VECTOR STORE
 # ===================================================
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
 CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "rag_documents")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))  # Texts per embed call
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))  # Parallel embed requests
+EMBEDDING_NUM_THREAD = int(os.getenv("EMBEDDING_NUM_THREAD", "0")) or None  # Ollama CPU threads; unset = server default
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "512"))  # Cached query embeddings
+PERSIST_EMBEDDING_CACHE = os.getenv("PERSIST_EMBEDDING_CACHE", "true").lower() in ("1", "true", "yes")  # SQLite
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(CACHE_DIR, "embedding_cache.sqlite3"))
+HNSW_THRESHOLD = int(os.getenv("HNSW_THRESHOLD", "50000"))  # Exact search below, HNSW graph from this size
+SAVE_EVERY_VECTORS = int(os.getenv("SAVE_EVERY_VECTORS", "1000"))  # add_documents persists after this many
+FAISS_THREADS = int(os.getenv("FAISS_THREADS", "0")) or None  # OpenMP threads for FAISS; unset = OpenMP default
+QUANTIZE_EMBEDDINGS = os.getenv("QUANTIZE_EMBEDDINGS", "false").lower() in ("1", "true", "yes")  # SQ8 index, 4x smaller
 
 # ===================================================
 # RAG SETTINGS
 # ===================================================
 RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+VALIDATION_SKIP_THRESHOLD = float(os.getenv("VALIDATION_SKIP_THRESHOLD", "0.85"))  # Top-1 cosine; >1 disables
+FUSE_GENERATE_VALIDATE = os.getenv("FUSE_GENERATE_VALIDATE", "true").lower() in ("1", "true", "yes")
+# Streaming shows tokens as they arrive, but generates with a plain LLM call
+# followed by one separate validation and no retries, so it bypasses the
+# fused generate+validate call and the retry loop. Off by default.
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() in ("1", "true", "yes")  # Stream answers in the UI
+
+# ===================================================
+# SEMANTIC RESPONSE CACHE
+# ===================================================
+USE_SEMANTIC_CACHE = os.getenv("USE_SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # Cosine similarity
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # Seconds
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
 
 # ===================================================
 # API KEYS (for non-Ollama models)
@@ -1,4 +1,19 @@
 from .state import RAGState
-from .workflow import create_rag_workflow, run_rag_query
+from .semantic_cache import SemanticResponseCache
+from .workflow import (
+    create_rag_workflow,
+    run_rag_query,
+    run_rag_query_stream,
+    clear_response_cache,
+    evict_workflow,
+)
 
-__all__ = ["RAGState", "create_rag_workflow", "run_rag_query"]
+__all__ = [
+    "RAGState",
+    "SemanticResponseCache",
+    "create_rag_workflow",
+    "run_rag_query",
+    "run_rag_query_stream",
+    "clear_response_cache",
+    "evict_workflow",
+]
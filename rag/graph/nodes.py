@@ -1,25 +1,30 @@
 """
 Agent nodes for the LangGraph RAG workflow.
-Implements: Retriever, Generator, Validator, and Final Response agents.
+Implements: Retriever, Generator, Validator, fused Generate + Validate,
+and Final Response agents.
 """
-from typing import List
+from functools import lru_cache
+from typing import Iterator, List, Optional
 from langchain_core.documents import Document
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
+from langchain_core.exceptions import OutputParserException
 
 from .state import RAGState
+from .semantic_cache import SemanticResponseCache
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from config import CHAT_MODEL, TEMPERATURE, MAX_TOKENS
+from config import CHAT_MODEL, TEMPERATURE, MAX_TOKENS, VALIDATION_SKIP_THRESHOLD
 from rag.retriever import VectorStore
 
 
 # =====================================================
 # SHARED LLM INSTANCE
 # =====================================================
+@lru_cache(maxsize=1)
 def get_llm():
     """Get the shared LLM instance."""
     return ChatOllama(
@@ -32,7 +37,20 @@ def get_llm():
 # =====================================================
 # RETRIEVER AGENT
 # =====================================================
-def retriever_agent(state: RAGState, vector_store: VectorStore) -> RAGState:
+def format_context(documents: List[Document]) -> str:
+    """Format retrieved documents with source headers for the prompts."""
+    return "\n\n".join(
+        f"[Source: {doc.metadata.get('source', 'unknown')}, Page {doc.metadata.get('page', '?')}]\n{doc.page_content}"
+        for doc in documents
+    )
+
+
+def retrieval_is_confident(state: RAGState) -> bool:
+    """Whether the top retrieved chunk is similar enough to skip validation."""
+    return state.get("top_score", 0.0) >= VALIDATION_SKIP_THRESHOLD
+
+
+def retriever_agent(state: RAGState, vector_store: VectorStore) -> dict:
     """
     Retriever Agent: Fetches relevant document chunks from the vector store.
     
@@ -41,22 +59,29 @@ def retriever_agent(state: RAGState, vector_store: VectorStore) -> RAGState:
         vector_store: VectorStore instance
         
     Returns:
-        Updated state with retrieved context
+        State update with retrieved context
     """
     question = state["question"]
     
     # Retrieve relevant documents
-    documents = vector_store.similarity_search(question)
+    results = vector_store.similarity_search_with_score(question)
+    documents = [doc for doc, _ in results]
+    
+    # Scores are cosine similarities, comparable to VALIDATION_SKIP_THRESHOLD
+    top_score = float(results[0][1]) if results else 0.0
     
-    # Extract source information
-    sources = list(set([
-        f"{doc.metadata.get('source', 'unknown')} (page {doc.metadata.get('page', '?')})"
+    # Extract source information in retrieval order, formatting only the
+    # unique (source, page) pairs
+    source_keys = dict.fromkeys(
+        (doc.metadata.get('source', 'unknown'), doc.metadata.get('page', '?'))
         for doc in documents
-    ]))
+    )
+    sources = [f"{source} (page {page})" for source, page in source_keys]
     
     return {
-        **state,
         "context": documents,
+        "context_text": format_context(documents),
+        "top_score": top_score,
         "sources": sources,
     }
 
@@ -78,24 +103,46 @@ Answer:"""),
 ])
 
 
-def generator_agent(state: RAGState) -> RAGState:
+def accept_confident_answer(state: RAGState, answer: str) -> dict:
+    """State update that sets the answer and marks it valid without validation."""
+    return {
+        "answer": answer,
+        "is_valid": True,
+        "validation_feedback": f"SKIPPED: top match similarity {state['top_score']:.2f}",
+    }
+
+
+def stream_answer(state: RAGState) -> Iterator[str]:
+    """
+    Stream the generator's answer token by token.
+    
+    Args:
+        state: Current workflow state with formatted context
+        
+    Yields:
+        Answer text chunks as the LLM produces them
+    """
+    llm = get_llm()
+    chain = GENERATOR_PROMPT | llm | StrOutputParser()
+    
+    yield from chain.stream({
+        "context": state["context_text"],
+        "question": state["question"],
+    })
+
+
+def generator_agent(state: RAGState) -> dict:
     """
     Generator Agent: Uses LLM to generate answers based on retrieved context.
     
     Args:
-        state: Current workflow state with context
+        state: Current workflow state with formatted context
         
     Returns:
-        Updated state with generated answer
+        State update with generated answer
     """
     question = state["question"]
-    context = state["context"]
-    
-    # Format context for the prompt
-    context_text = "\n\n".join([
-        f"[Source: {doc.metadata.get('source', 'unknown')}, Page {doc.metadata.get('page', '?')}]\n{doc.page_content}"
-        for doc in context
-    ])
+    context_text = state["context_text"]
     
     # Generate answer
     llm = get_llm()
@@ -106,8 +153,11 @@ def generator_agent(state: RAGState) -> RAGState:
         "question": question,
     })
     
+    # Confident retrievals skip the validator, so accept the answer here
+    if retrieval_is_confident(state):
+        return accept_confident_answer(state, answer)
+    
     return {
-        **state,
         "answer": answer,
     }
 
@@ -138,7 +188,7 @@ Evaluation:"""),
 ])
 
 
-def validator_agent(state: RAGState) -> RAGState:
+def validator_agent(state: RAGState) -> dict:
     """
     Validator Agent: Evaluates the generated answer for relevance and hallucinations.
     
@@ -146,16 +196,13 @@ def validator_agent(state: RAGState) -> RAGState:
         state: Current workflow state with answer
         
     Returns:
-        Updated state with validation result
+        State update with validation result
     """
     question = state["question"]
-    context = state["context"]
+    context_text = state["context_text"]
     answer = state["answer"]
     retry_count = state.get("retry_count", 0)
     
-    # Format context for validation
-    context_text = "\n\n".join([doc.page_content for doc in context])
-    
     # Validate answer
     llm = get_llm()
     chain = VALIDATOR_PROMPT | llm | StrOutputParser()
@@ -169,7 +216,74 @@ def validator_agent(state: RAGState) -> RAGState:
     is_valid = validation_result.strip().upper().startswith("VALID")
     
     return {
-        **state,
+        "is_valid": is_valid,
+        "validation_feedback": validation_result,
+        "retry_count": retry_count + 1 if not is_valid else retry_count,
+    }
+
+
+# =====================================================
+# GENERATE + VALIDATE AGENT (single LLM call)
+# =====================================================
+GENERATE_AND_VALIDATE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful assistant that answers questions based on the provided context.
+Use ONLY the information from the context to answer the question.
+If the context doesn't contain enough information to answer, say so clearly.
+Be concise but thorough in your answer.
+
+Then check your own answer for:
+1. Relevance: Does the answer address the question?
+2. Groundedness: Is the answer supported by the context?
+3. Completeness: Does the answer fully address the question?
+
+Respond with a single JSON object and nothing else:
+{{"answer": "<your answer>", "validation": "VALID" or "INVALID: <reason>"}}"""),
+    ("human", """Context:
+{context}
+
+Question: {question}
+
+JSON:"""),
+])
+
+
+def generate_validate_agent(state: RAGState) -> dict:
+    """
+    Generate + Validate Agent: Answers and self-checks in one LLM call,
+    so the context is only sent (and prefilled) once per attempt.
+    
+    Args:
+        state: Current workflow state with context
+        
+    Returns:
+        State update with generated answer and validation result
+    """
+    question = state["question"]
+    context_text = state["context_text"]
+    retry_count = state.get("retry_count", 0)
+    
+    # Generate and validate answer
+    llm = get_llm()
+    chain = GENERATE_AND_VALIDATE_PROMPT | llm | StrOutputParser()
+    
+    raw_output = chain.invoke({
+        "context": context_text,
+        "question": question,
+    })
+    
+    try:
+        parsed = JsonOutputParser().parse(raw_output)
+        answer = str(parsed.get("answer", "")).strip()
+        validation_result = str(parsed.get("validation", "")).strip()
+    except (OutputParserException, AttributeError):
+        # Keep the raw text as the answer but treat it as unverified
+        answer = raw_output
+        validation_result = "INVALID: response was not valid JSON"
+    
+    is_valid = bool(answer) and validation_result.upper().startswith("VALID")
+    
+    return {
+        "answer": answer,
         "is_valid": is_valid,
         "validation_feedback": validation_result,
         "retry_count": retry_count + 1 if not is_valid else retry_count,
@@ -179,15 +293,19 @@ def validator_agent(state: RAGState) -> RAGState:
 # =====================================================
 # FINAL RESPONSE AGENT
 # =====================================================
-def final_response_agent(state: RAGState) -> RAGState:
+def final_response_agent(
+    state: RAGState,
+    response_cache: Optional[SemanticResponseCache] = None
+) -> dict:
     """
     Final Response Agent: Formats and returns the validated answer.
     
     Args:
         state: Current workflow state
+        response_cache: Optional semantic cache to store validated responses
         
     Returns:
-        Updated state with final formatted response
+        State update with final formatted response
     """
     answer = state["answer"]
     sources = state.get("sources", [])
@@ -208,8 +326,11 @@ def final_response_agent(state: RAGState) -> RAGState:
     
     final_response = f"{answer}{source_text}{warning}"
     
+    # Only validated answers are worth serving again
+    if response_cache is not None and is_valid:
+        response_cache.insert(state["question"], final_response, sources)
+    
     return {
-        **state,
         "final_response": final_response,
     }
 
@@ -219,7 +340,7 @@ def final_response_agent(state: RAGState) -> RAGState:
 # =====================================================
 def create_retriever_node(vector_store: VectorStore):
     """Create a retriever node with bound vector store."""
-    def node(state: RAGState) -> RAGState:
+    def node(state: RAGState) -> dict:
         return retriever_agent(state, vector_store)
     return node
 
@@ -234,6 +355,13 @@ def create_validator_node():
     return validator_agent
 
 
-def create_final_response_node():
-    """Create a final response node."""
-    return final_response_agent
+def create_generate_validate_node():
+    """Create a fused generate + validate node."""
+    return generate_validate_agent
+
+
+def create_final_response_node(response_cache: Optional[SemanticResponseCache] = None):
+    """Create a final response node with optional bound response cache."""
+    def node(state: RAGState) -> dict:
+        return final_response_agent(state, response_cache)
+    return node
@@ -0,0 +1,130 @@
+"""
+Semantic cache for final RAG responses.
+Returns a cached answer when a new question is close enough (cosine
+similarity) to a previously answered one.
+"""
+import time
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_SIZE
+
+
+class SemanticResponseCache:
+    """
+    LRU cache of validated responses keyed on query embeddings.
+    
+    Embeddings are stored L2-normalized in a contiguous float32 matrix
+    (oldest entry first), so a lookup is a single matrix-vector product.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            embed_fn: Function that embeds a query string
+            threshold: Minimum cosine similarity for a cache hit
+            ttl: Seconds before a cached response expires
+            max_entries: Maximum number of cached responses
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold if threshold is not None else SEMANTIC_CACHE_THRESHOLD
+        self.ttl = ttl if ttl is not None else SEMANTIC_CACHE_TTL
+        self.max_entries = max_entries or SEMANTIC_CACHE_SIZE
+        
+        self._embeddings: Optional[np.ndarray] = None  # (N, d) float32
+        self._entries: List[Tuple[str, List[str], float]] = []  # (response, sources, ts)
+        self._lock = threading.Lock()
+    
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+    
+    def _remove(self, idx: int):
+        """Remove the entry at the given row."""
+        self._embeddings = np.delete(self._embeddings, idx, axis=0)
+        self._entries.pop(idx)
+    
+    def lookup(self, question: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Find a cached response for a semantically similar question.
+        
+        Args:
+            question: User's question
+            
+        Returns:
+            Tuple of (final_response, sources) on a hit, None otherwise
+        """
+        if not self._entries:
+            return None
+        
+        query = self._normalize(self.embed_fn(question))
+        
+        with self._lock:
+            if not self._entries:
+                return None
+            
+            scores = self._embeddings @ query
+            idx = int(np.argmax(scores))
+            if scores[idx] < self.threshold:
+                return None
+            
+            response, sources, ts = self._entries[idx]
+            if time.time() - ts > self.ttl:
+                self._remove(idx)
+                return None
+            
+            # Mark as most recently used by moving the row to the end
+            self._embeddings[idx:] = np.roll(self._embeddings[idx:], -1, axis=0)
+            self._entries.append(self._entries.pop(idx))
+            
+            return response, list(sources)
+    
+    def insert(self, question: str, response: str, sources: List[str]):
+        """
+        Cache a validated response for a question.
+        
+        Args:
+            question: User's question
+            response: Final formatted response
+            sources: Source citations for the response
+        """
+        query = self._normalize(self.embed_fn(question))
+        entry = (response, list(sources), time.time())
+        
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != query.shape[0]:
+                self._embeddings = query[np.newaxis, :].copy()
+                self._entries = [entry]
+            elif len(self._entries) >= self.max_entries:
+                # Evict the least recently used entry (row 0)
+                self._embeddings = np.roll(self._embeddings, -1, axis=0)
+                self._embeddings[-1] = query
+                self._entries.pop(0)
+                self._entries.append(entry)
+            else:
+                self._embeddings = np.vstack([self._embeddings, query])
+                self._entries.append(entry)
+    
+    def clear(self):
+        """Remove all cached responses."""
+        with self._lock:
+            self._embeddings = None
+            self._entries = []
+    
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -14,6 +14,8 @@ class RAGState(TypedDict):
     
     # Retrieved context
     context: List[Document]
+    context_text: str  # Context formatted for prompts, built once per retrieval
+    top_score: float  # Cosine similarity of the best match (0.0 if unknown)
     
     # Generated answer
     answer: str
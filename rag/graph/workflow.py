@@ -1,21 +1,33 @@
 """
 LangGraph workflow for the RAG pipeline.
 Orchestrates Retriever -> Generator -> Validator -> Response with retry logic.
+Generator and Validator run as one fused LLM call when FUSE_GENERATE_VALIDATE is on.
 """
+import threading
+from typing import Dict, Iterator, Optional
+
 from langgraph.graph import StateGraph, END
 
 from .state import RAGState
+from .semantic_cache import SemanticResponseCache
 from .nodes import (
+    retriever_agent,
+    validator_agent,
+    final_response_agent,
+    stream_answer,
+    accept_confident_answer,
     create_retriever_node,
+    retrieval_is_confident,
     create_generator_node,
     create_validator_node,
+    create_generate_validate_node,
     create_final_response_node,
 )
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from config import MAX_RETRIES
+from config import MAX_RETRIES, USE_SEMANTIC_CACHE, FUSE_GENERATE_VALIDATE
 from rag.retriever import VectorStore
 
 
@@ -38,15 +50,45 @@ def should_retry(state: RAGState) -> str:
         return "respond"
 
 
-def create_rag_workflow(vector_store: VectorStore) -> StateGraph:
+def should_validate(state: RAGState) -> str:
+    """
+    Conditional edge: Skip validation when retrieval is confident enough.
+    
+    Returns:
+        "respond" if the top match clears VALIDATION_SKIP_THRESHOLD, "validate" otherwise
+    """
+    return "respond" if retrieval_is_confident(state) else "validate"
+
+
+def route_generation(state: RAGState) -> str:
+    """
+    Conditional edge (fused mode): Use plain generation when retrieval is
+    confident enough, otherwise the fused generate + validate call.
+    
+    Returns:
+        "generate" or "generate_validate"
+    """
+    return "generate" if retrieval_is_confident(state) else "generate_validate"
+
+
+def create_rag_workflow(
+    vector_store: VectorStore,
+    response_cache: Optional[SemanticResponseCache] = None
+) -> StateGraph:
     """
     Create the LangGraph RAG workflow.
     
     Flow:
     START -> retrieve -> generate -> validate -> (retry or respond) -> END
     
+    With FUSE_GENERATE_VALIDATE:
+    START -> retrieve -> generate_validate -> (retry or respond) -> END
+    
+    In both, a confident retrieval goes straight from generate to respond.
+    
     Args:
         vector_store: VectorStore instance for retrieval
+        response_cache: Optional semantic cache filled with validated responses
         
     Returns:
         Compiled StateGraph
@@ -56,50 +98,156 @@ def create_rag_workflow(vector_store: VectorStore) -> StateGraph:
     
     # Add nodes
     workflow.add_node("retrieve", create_retriever_node(vector_store))
-    workflow.add_node("generate", create_generator_node())
-    workflow.add_node("validate", create_validator_node())
-    workflow.add_node("respond", create_final_response_node())
-    
-    # Define edges
+    workflow.add_node("respond", create_final_response_node(response_cache))
     workflow.set_entry_point("retrieve")
-    workflow.add_edge("retrieve", "generate")
-    workflow.add_edge("generate", "validate")
-    
-    # Conditional edge: retry or respond
-    workflow.add_conditional_edges(
-        "validate",
-        should_retry,
-        {
-            "generate": "generate",
-            "respond": "respond",
-        }
-    )
+    
+    if FUSE_GENERATE_VALIDATE:
+        # One LLM call produces both the answer and its validation
+        workflow.add_node("generate", create_generator_node())
+        workflow.add_node("generate_validate", create_generate_validate_node())
+        workflow.add_conditional_edges(
+            "retrieve",
+            route_generation,
+            {
+                "generate": "generate",
+                "generate_validate": "generate_validate",
+            }
+        )
+        workflow.add_edge("generate", "respond")
+        
+        # Conditional edge: retry or respond
+        workflow.add_conditional_edges(
+            "generate_validate",
+            should_retry,
+            {
+                "generate": "generate_validate",
+                "respond": "respond",
+            }
+        )
+    else:
+        workflow.add_node("generate", create_generator_node())
+        workflow.add_node("validate", create_validator_node())
+        
+        # Define edges
+        workflow.add_edge("retrieve", "generate")
+        
+        # Conditional edge: validate or skip straight to respond
+        workflow.add_conditional_edges(
+            "generate",
+            should_validate,
+            {
+                "validate": "validate",
+                "respond": "respond",
+            }
+        )
+        
+        # Conditional edge: retry or respond
+        workflow.add_conditional_edges(
+            "validate",
+            should_retry,
+            {
+                "generate": "generate",
+                "respond": "respond",
+            }
+        )
     
     workflow.add_edge("respond", END)
     
     return workflow.compile()
 
 
-def run_rag_query(
-    question: str, 
-    vector_store: VectorStore
-) -> dict:
+# Compiled workflows and semantic caches, keyed on id(vector_store).
+# Both hold a reference to their vector store, so an id can't be reused
+# while its entry is alive. Stores enter the registry through
+# _get_response_cache, which bounds it to _MAX_WORKFLOWS stores.
+_WORKFLOWS: Dict[int, StateGraph] = {}
+_RESPONSE_CACHES: Dict[int, Optional[SemanticResponseCache]] = {}
+_MAX_WORKFLOWS = 4
+# Guards both registries; reentrant since _get_workflow registers the
+# store and creates the response cache while holding it
+_REGISTRY_LOCK = threading.RLock()
+
+
+def _get_response_cache(vector_store: VectorStore) -> Optional[SemanticResponseCache]:
     """
-    Run a RAG query through the workflow.
+    Get the semantic response cache for a vector store.
+    
+    Both query paths register their store here, so this is where the
+    oldest store is evicted once the registry is full.
+    
+    Returns:
+        SemanticResponseCache, or None if USE_SEMANTIC_CACHE is off
+    """
+    key = id(vector_store)
+    with _REGISTRY_LOCK:
+        if key not in _RESPONSE_CACHES:
+            # Drop the oldest entry so stale sessions don't pin their stores
+            if len(_RESPONSE_CACHES) >= _MAX_WORKFLOWS:
+                _evict(next(iter(_RESPONSE_CACHES)))
+            _RESPONSE_CACHES[key] = SemanticResponseCache(vector_store.embed_query) if USE_SEMANTIC_CACHE else None
+        return _RESPONSE_CACHES[key]
+
+
+def clear_response_cache(vector_store: VectorStore):
+    """
+    Drop cached responses for a vector store (e.g. after its documents change).
     
     Args:
-        question: User's question
         vector_store: VectorStore instance
+    """
+    with _REGISTRY_LOCK:
+        response_cache = _RESPONSE_CACHES.get(id(vector_store))
+    if response_cache is not None:
+        response_cache.clear()
+
+
+def _get_workflow(vector_store: VectorStore) -> StateGraph:
+    """
+    Get the compiled workflow for a vector store, compiling it only once.
+    
+    Args:
+        vector_store: VectorStore instance for retrieval
         
     Returns:
-        Final state with response
+        Compiled StateGraph
     """
-    workflow = create_rag_workflow(vector_store)
+    key = id(vector_store)
+    with _REGISTRY_LOCK:
+        workflow = _WORKFLOWS.get(key)
+        if workflow is None:
+            # Registers the store (evicting if full) before compiling
+            response_cache = _get_response_cache(vector_store)
+            workflow = create_rag_workflow(vector_store, response_cache)
+            _WORKFLOWS[key] = workflow
+        return workflow
+
+
+def _evict(key: int):
+    """Remove the workflow and response cache stored under a key."""
+    with _REGISTRY_LOCK:
+        _WORKFLOWS.pop(key, None)
+        response_cache = _RESPONSE_CACHES.pop(key, None)
+    if response_cache is not None:
+        response_cache.clear()
+
+
+def evict_workflow(vector_store: VectorStore):
+    """
+    Release the compiled workflow and response cache for a vector store.
     
-    # Initialize state
-    initial_state: RAGState = {
+    Args:
+        vector_store: VectorStore instance
+    """
+    _evict(id(vector_store))
+
+
+def _initial_state(question: str) -> RAGState:
+    """Build the starting state for a query."""
+    return {
         "question": question,
         "context": [],
+        "context_text": "",
+        "top_score": 0.0,
         "answer": "",
         "is_valid": False,
         "validation_feedback": "",
@@ -107,8 +255,101 @@ def run_rag_query(
         "final_response": "",
         "sources": [],
     }
+
+
+def _cached_state(question: str, vector_store: VectorStore) -> Optional[RAGState]:
+    """Final state served from the semantic cache, or None on a miss."""
+    response_cache = _get_response_cache(vector_store)
+    if response_cache is None:
+        return None
+    
+    cached = response_cache.lookup(question)
+    if cached is None:
+        return None
+    
+    final_response, sources = cached
+    return {
+        **_initial_state(question),
+        "is_valid": True,
+        "final_response": final_response,
+        "sources": sources,
+    }
+
+
+def run_rag_query(
+    question: str, 
+    vector_store: VectorStore
+) -> dict:
+    """
+    Run a RAG query through the workflow.
+    
+    Args:
+        question: User's question
+        vector_store: VectorStore instance
+        
+    Returns:
+        Final state with response
+    """
+    # Serve paraphrased repeats from the semantic cache
+    cached_state = _cached_state(question, vector_store)
+    if cached_state is not None:
+        return cached_state
     
     # Run the workflow
-    final_state = workflow.invoke(initial_state)
+    workflow = _get_workflow(vector_store)
+    final_state = workflow.invoke(_initial_state(question))
     
     return final_state
+
+
+def run_rag_query_stream(
+    question: str,
+    vector_store: VectorStore
+) -> Iterator[dict]:
+    """
+    Run a RAG query, streaming the generated answer as it is produced.
+    
+    Retrieval runs first, then generator tokens are yielded as they arrive.
+    The validator runs once on the completed answer; there are no retries
+    since the answer is already on screen, so a failed validation only adds
+    the usual warning.
+    
+    Args:
+        question: User's question
+        vector_store: VectorStore instance
+        
+    Yields:
+        {"token": str} events with response text, then one
+        {"final_state": dict} event with the complete state
+    """
+    cached_state = _cached_state(question, vector_store)
+    if cached_state is not None:
+        yield {"token": cached_state["final_response"]}
+        yield {"final_state": cached_state}
+        return
+    
+    state = _initial_state(question)
+    state.update(retriever_agent(state, vector_store))
+    
+    # Stream the answer
+    answer_parts = []
+    for token in stream_answer(state):
+        answer_parts.append(token)
+        yield {"token": token}
+    answer = "".join(answer_parts)
+    
+    # Validate the completed answer
+    if retrieval_is_confident(state):
+        state.update(accept_confident_answer(state, answer))
+    else:
+        state["answer"] = answer
+        state.update(validator_agent(state))
+    
+    state.update(final_response_agent(state, _get_response_cache(vector_store)))
+    
+    # Emit the sources and any warning appended to the answer
+    suffix = state["final_response"][len(answer):]
+    if suffix:
+        yield {"token": suffix}
+    
+    yield {"final_state": state}
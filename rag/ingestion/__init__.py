@@ -1,12 +1,25 @@
+"""
+Document ingestion: loading, OCR and semantic chunking.
+
+Chunks produced here are embedded by VectorStore.add_documents before they
+are inserted into the index, so EMBEDDING_MODEL must be set in the
+environment when the Ollama embedding backend is used.
+"""
 from .loader import PDFLoader, ImageLoader, BaseLoader
 from .ocr_service import OCRService
+from .ocr_cache import OCRCache
 from .processor import SemanticTextProcessor, TextProcessor
+from .pipeline import ingest_files, load_file, SUPPORTED_SUFFIXES
 
 __all__ = [
     "PDFLoader", 
     "ImageLoader", 
     "BaseLoader",
     "OCRService", 
+    "OCRCache",
     "SemanticTextProcessor",
     "TextProcessor",
+    "ingest_files",
+    "load_file",
+    "SUPPORTED_SUFFIXES",
 ]
@@ -2,17 +2,31 @@
 Document loaders for PDF and image files.
 Supports OCR for scanned documents and images.
 """
+import functools
+import gc
 import os
+import queue
 import sys
+import tempfile
+import threading
+from contextlib import closing
+from itertools import islice
 from pathlib import Path
-from typing import List, Union
+from typing import Iterator, List, Optional, Union
 from abc import ABC, abstractmethod
 from pypdf import PdfReader
 from PIL import Image
 
 # Import config for poppler path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from config import POPPLER_PATH
+from config import POPPLER_PATH, PDF_DPI, PDF_GRAYSCALE, OCR_PAGE_WORKERS, OCR_BATCH_SIZE
+
+# Prefer PyMuPDF for rendering PDF pages: it streams one page at a time
+try:
+    import pymupdf
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
 
 # Try to import pdf2image for converting PDF pages to images
 try:
@@ -20,11 +34,45 @@ try:
     PDF2IMAGE_AVAILABLE = True
 except ImportError:
     PDF2IMAGE_AVAILABLE = False
-    print("Warning: pdf2image not available. PDF OCR will be limited.")
+    if not PYMUPDF_AVAILABLE:
+        print("Warning: neither PyMuPDF nor pdf2image available. PDF OCR will be limited.")
+
+
+# Poppler threads for rasterization, leaving one core free
+RASTER_THREADS = max(1, (os.cpu_count() or 2) - 1)
+
+# Pages rendered ahead of OCR by the background renderer
+PAGE_QUEUE_SIZE = 4
+
+# Run a full garbage collection after this many OCR'd pages
+GC_EVERY_PAGES = 64
+
+# Marks the end of the rendered page queue
+_DONE = object()
+
+
+def _contiguous_runs(page_numbers: List[int]) -> List[tuple[int, int]]:
+    """Group sorted page indices into inclusive (first, last) runs."""
+    runs = []
+    for page_num in page_numbers:
+        if runs and page_num == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], page_num)
+        else:
+            runs.append((page_num, page_num))
+    return runs
 
 
+def _stat_file(file_path: str) -> os.stat_result:
+    """Stat an input file, raising FileNotFoundError if it is missing."""
+    try:
+        return os.stat(file_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {file_path}") from None
+
+
+@functools.lru_cache(maxsize=1)
 def get_poppler_path():
-    """Get poppler path for Windows."""
+    """Get poppler path for Windows (looked up once per process)."""
     # First check config/env
     if POPPLER_PATH and os.path.exists(POPPLER_PATH):
         return POPPLER_PATH
@@ -64,7 +112,13 @@ class PDFLoader(BaseLoader):
     Supports both text-based PDFs and scanned PDFs (with OCR).
     """
     
-    def __init__(self, ocr_service=None, force_ocr: bool = True):
+    def __init__(
+        self,
+        ocr_service=None,
+        force_ocr: bool = True,
+        dpi: Optional[int] = None,
+        grayscale: Optional[bool] = None
+    ):
         """
         Initialize PDF loader.
         
@@ -72,9 +126,14 @@ class PDFLoader(BaseLoader):
             ocr_service: Optional OCRService instance for OCR
             force_ocr: If True, always use OCR (recommended for accuracy).
                        If False, only use OCR for pages with no extractable text.
+            dpi: Rasterization resolution for OCR (default: from config)
+            grayscale: Render pages in grayscale (default: from config)
         """
         self.ocr_service = ocr_service
         self.force_ocr = force_ocr
+        self.dpi = dpi or PDF_DPI
+        # OCR needs no colour; grayscale is a third of the pixel data
+        self.grayscale = PDF_GRAYSCALE if grayscale is None else grayscale
     
     def load(self, file_path: str) -> List[str]:
         """
@@ -86,35 +145,163 @@ class PDFLoader(BaseLoader):
         Returns:
             List of text strings, one per page
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        _stat_file(file_path)
         
         # If force_ocr and we have OCR service, use OCR for all pages
-        if self.force_ocr and self.ocr_service and PDF2IMAGE_AVAILABLE:
+        if self.force_ocr and self.ocr_service and (PYMUPDF_AVAILABLE or PDF2IMAGE_AVAILABLE):
             return self._load_with_ocr(file_path)
         else:
             return self._load_with_text_extraction(file_path)
     
+    def _iter_pages(
+        self,
+        file_path: str,
+        page_numbers: Optional[List[int]] = None
+    ) -> Iterator[Image.Image]:
+        """
+        Render PDF pages one at a time.
+        
+        Uses PyMuPDF when available, otherwise pdf2image writing pages to
+        a temporary directory. Either way only the current page is held
+        in memory.
+        
+        Args:
+            file_path: Path to PDF file
+            page_numbers: Sorted 0-based pages to render (default: all)
+            
+        Yields:
+            PIL Image per page, in page order
+        """
+        if PYMUPDF_AVAILABLE:
+            with pymupdf.open(file_path) as doc:
+                pages = doc if page_numbers is None else (doc.load_page(i) for i in page_numbers)
+                for page in pages:
+                    if self.grayscale:
+                        pix = page.get_pixmap(dpi=self.dpi, colorspace=pymupdf.csGRAY)
+                        yield Image.frombytes("L", (pix.width, pix.height), pix.samples)
+                    else:
+                        pix = page.get_pixmap(dpi=self.dpi)
+                        yield Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            return
+        
+        # Get poppler path for Windows
+        poppler_path = get_poppler_path()
+        if poppler_path:
+            print(f"[OCR] Using poppler from: {poppler_path}")
+        
+        # Rasterize only the requested pages, one contiguous run per call
+        runs = [(None, None)] if page_numbers is None else _contiguous_runs(page_numbers)
+        for first, last in runs:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                page_paths = convert_from_path(
+                    file_path,
+                    poppler_path=poppler_path,
+                    dpi=self.dpi,
+                    grayscale=self.grayscale,
+                    first_page=None if first is None else first + 1,
+                    last_page=None if last is None else last + 1,
+                    thread_count=RASTER_THREADS,
+                    output_folder=tmpdir,
+                    fmt="jpeg",
+                    paths_only=True,
+                )
+                for page_path in page_paths:
+                    # Decode now and close the file: pages may outlive this
+                    # temp dir in the prefetch queue, and Windows cannot
+                    # delete files that are still open
+                    with Image.open(page_path) as image:
+                        image.load()
+                        page = image.copy()
+                    yield page
+    
+    def _prefetch_pages(self, file_path: str) -> Iterator[Image.Image]:
+        """
+        Render pages on a background thread while the caller OCRs.
+        
+        The renderer stays at most PAGE_QUEUE_SIZE pages ahead, so memory
+        is bounded by the queue rather than the page count.
+        
+        Args:
+            file_path: Path to PDF file
+            
+        Yields:
+            PIL Image per page, in page order
+        """
+        pages = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            # Give up once the consumer has gone away
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            rendered = self._iter_pages(file_path)
+            try:
+                for image in rendered:
+                    if not put(image):
+                        image.close()
+                        return
+                put(_DONE)
+            except Exception as e:
+                put(e)
+            finally:
+                rendered.close()
+        
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+            # Release pages rendered ahead that were never consumed
+            while not pages.empty():
+                item = pages.get_nowait()
+                if isinstance(item, Image.Image):
+                    item.close()
+    
     def _load_with_ocr(self, file_path: str) -> List[str]:
         """Load PDF using OCR for all pages."""
         print(f"[OCR] Processing PDF with Ollama OCR: {file_path}")
         
         try:
-            # Get poppler path for Windows
-            poppler_path = get_poppler_path()
-            if poppler_path:
-                print(f"[OCR] Using poppler from: {poppler_path}")
-            
-            # Convert all pages to images
-            images = convert_from_path(file_path, poppler_path=poppler_path)
-            print(f"[OCR] Converted {len(images)} pages to images")
-            
+            # OCR pages in batches: ChatOllama.batch sends the requests
+            # concurrently while the next pages render in the background
             text_content = []
-            for i, image in enumerate(images):
-                print(f"[OCR] Processing page {i + 1}/{len(images)}...")
-                text = self.ocr_service.extract_text(image)
-                text_content.append(text)
-                print(f"[OCR] Page {i + 1} extracted: {len(text)} chars")
+            with closing(self._prefetch_pages(file_path)) as pages:
+                while True:
+                    batch = list(islice(pages, OCR_BATCH_SIZE))
+                    if not batch:
+                        break
+                    first = len(text_content) + 1
+                    print(f"[OCR] Processing pages {first}-{first + len(batch) - 1}...")
+                    try:
+                        texts = self.ocr_service.extract_text_batch(
+                            batch, max_concurrency=OCR_PAGE_WORKERS
+                        )
+                    finally:
+                        for image in batch:
+                            image.close()
+                    for page_num, text in enumerate(texts, start=first):
+                        print(f"[OCR] Page {page_num} extracted: {len(text)} chars")
+                    text_content.extend(texts)
+                    del batch
+                    
+                    # Reclaim cycles held by large page buffers on long documents
+                    if len(text_content) // GC_EVERY_PAGES > (first - 1) // GC_EVERY_PAGES:
+                        gc.collect()
             
             return text_content
             
@@ -142,19 +329,18 @@ class PDFLoader(BaseLoader):
                     pages_needing_ocr.append(page_num)
             
             # If OCR is available and needed, process scanned pages
-            if pages_needing_ocr and self.ocr_service and PDF2IMAGE_AVAILABLE:
+            if pages_needing_ocr and self.ocr_service and (PYMUPDF_AVAILABLE or PDF2IMAGE_AVAILABLE):
                 try:
                     print(f"[OCR] Running OCR on {len(pages_needing_ocr)} scanned pages...")
                     
-                    # Convert all pages and pick the ones we need
-                    poppler_path = get_poppler_path()
-                    images = convert_from_path(file_path, poppler_path=poppler_path)
-                    
-                    for page_num in pages_needing_ocr:
-                        if page_num < len(images):
-                            print(f"[OCR] Processing page {page_num + 1}...")
-                            ocr_text = self.ocr_service.extract_text(images[page_num])
-                            text_content[page_num] = ocr_text
+                    # Render only the pages we need
+                    images = self._iter_pages(file_path, pages_needing_ocr)
+                    for page_num, image in zip(pages_needing_ocr, images):
+                        print(f"[OCR] Processing page {page_num + 1}...")
+                        try:
+                            text_content[page_num] = self.ocr_service.extract_text(image)
+                        finally:
+                            image.close()
                             
                 except Exception as e:
                     print(f"[OCR] OCR fallback failed: {e}")
@@ -179,7 +365,7 @@ class PDFLoader(BaseLoader):
             raise RuntimeError("pdf2image is required for load_with_images")
         
         text_content = self.load(file_path)
-        images = convert_from_path(file_path)
+        images = convert_from_path(file_path, dpi=self.dpi, grayscale=self.grayscale)
         
         return text_content, images
 
@@ -206,8 +392,7 @@ class ImageLoader(BaseLoader):
         Returns:
             List with single text string from OCR
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        _stat_file(file_path)
         
         try:
             image = Image.open(file_path).convert("RGB")
@@ -235,7 +420,6 @@ class ImageLoader(BaseLoader):
         Returns:
             PIL Image object
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
+        _stat_file(file_path)
         
         return Image.open(file_path).convert("RGB")
@@ -0,0 +1,108 @@
+"""
+Persistent OCR result cache backed by SQLite.
+Results are keyed on a BLAKE2b hash of the encoded page image, the model
+name and the prompt, so re-ingesting a document skips pages already seen.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class OCRCache:
+    """
+    Content-addressed store of OCR text, with an in-memory LRU in front.
+    """
+    
+    def __init__(self, db_path: str, model_name: str, prompt: str, memory_size: int = 256):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            db_path: Path to the SQLite file
+            model_name: OCR model name, mixed into every key
+            prompt: OCR instruction, mixed into every key
+            memory_size: Results kept in the in-memory LRU
+        """
+        self.db_path = db_path
+        self.model_name = model_name or ""
+        self.memory_size = memory_size
+        # Model and prompt hashed once; each key copies this state
+        self._key_prefix = hashlib.blake2b(
+            f"{self.model_name}\0{prompt}\0".encode("utf-8"), digest_size=16
+        )
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache (key TEXT PRIMARY KEY, text TEXT)"
+        )
+        self._conn.commit()
+    
+    def key(self, image_bytes: bytes) -> str:
+        """Cache key for an encoded image under the current model and prompt."""
+        digest = self._key_prefix.copy()
+        digest.update(image_bytes)
+        return digest.hexdigest()
+    
+    def _remember(self, key: str, text: str):
+        """Insert into the in-memory LRU (lock must be held)."""
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+    
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """
+        Look up OCR text for several keys.
+        
+        Returns:
+            One text (or None if not cached) per key
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+            
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, text FROM ocr_cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, text in rows:
+                    self._remember(key, text)
+                    found[key] = text
+        
+        return [found.get(key) for key in keys]
+    
+    def get(self, key: str) -> Optional[str]:
+        """Look up OCR text for a key, or None if not cached."""
+        return self.get_many([key])[0]
+    
+    def put_many(self, keys: List[str], texts: List[str]):
+        """Store OCR text for several keys."""
+        rows = list(zip(keys, texts))
+        with self._lock:
+            for key, text in rows:
+                self._remember(key, text)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ocr_cache (key, text) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+    
+    def put(self, key: str, text: str):
+        """Store OCR text for a key."""
+        self.put_many([key], [text])
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
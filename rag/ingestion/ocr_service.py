@@ -3,6 +3,8 @@ OCR Service using Ollama vision model (deepseek-ocr).
 Extracts text from images using multimodal LLM.
 """
 import base64
+import os
+import threading
 from io import BytesIO
 from typing import List, Optional
 from PIL import Image
@@ -12,7 +14,27 @@ from langchain_core.messages import HumanMessage
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from config import OCR_MODEL, MAX_TOKENS, TEMPERATURE
+from config import (
+    OCR_MODEL, MAX_TOKENS, TEMPERATURE,
+    USE_OCR_CACHE, OCR_CACHE_PATH, OCR_CACHE_SIZE
+)
+from .ocr_cache import OCRCache
+
+# Encode through libjpeg-turbo directly when PyTurboJPEG and its shared
+# library are installed; otherwise Pillow's JPEG encoder is used
+try:
+    import numpy as np
+    from turbojpeg import TurboJPEG, TJPF_GRAY, TJPF_RGB, TJSAMP_GRAY
+    _TURBOJPEG = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except Exception:
+    _TURBOJPEG = None
+    TURBOJPEG_AVAILABLE = False
+
+
+# Per-thread JPEG output buffer, reused across pages so its storage is not
+# reallocated (and left in the allocator's free lists) for every page
+_tls = threading.local()
 
 
 class OCRService:
@@ -21,12 +43,18 @@ class OCRService:
     # Instruction prompt for OCR
     OCR_INSTRUCTION = """<image>\nFree OCR."""
     
-    def __init__(self, model_name: Optional[str] = None):
+    # Page encoding: JPEG is far smaller than PNG for scans, and text stays
+    # legible at this quality and size
+    MAX_IMAGE_EDGE = 2000
+    JPEG_QUALITY = 85
+    
+    def __init__(self, model_name: Optional[str] = None, use_cache: bool = USE_OCR_CACHE):
         """
         Initialize the OCR service with Ollama vision model.
         
         Args:
             model_name: Ollama model name (default: from config)
+            use_cache: Reuse OCR results for pages seen before
         """
         self.model_name = model_name or OCR_MODEL
         self.llm = ChatOllama(
@@ -34,15 +62,74 @@ class OCRService:
             temperature=TEMPERATURE,
             num_predict=MAX_TOKENS,
         )
+        self.cache = self._init_cache() if use_cache else None
+    
+    def _init_cache(self) -> Optional[OCRCache]:
+        """Open the persistent OCR result cache."""
+        try:
+            # Generation settings change the output, so they are part of the key
+            model_key = f"{self.model_name}/t={TEMPERATURE}/n={MAX_TOKENS}"
+            os.makedirs(os.path.dirname(OCR_CACHE_PATH) or ".", exist_ok=True)
+            return OCRCache(OCR_CACHE_PATH, model_key, self.OCR_INSTRUCTION, OCR_CACHE_SIZE)
+        except Exception as e:
+            print(f"Could not open OCR cache: {e}")
+            return None
+    
+    def _encode_image(self, image: Image.Image) -> bytes:
+        """Encode PIL Image as JPEG bytes, long edge capped."""
+        original = image
+        try:
+            # Convert to RGB if necessary (handles RGBA, P mode, etc.)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            long_edge = max(image.size)
+            if long_edge > self.MAX_IMAGE_EDGE:
+                # resize() returns a new image, leaving the caller's page intact
+                scale = self.MAX_IMAGE_EDGE / long_edge
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            
+            if TURBOJPEG_AVAILABLE:
+                if image.mode == 'L':
+                    return _TURBOJPEG.encode(
+                        np.asarray(image)[..., None],
+                        quality=self.JPEG_QUALITY,
+                        pixel_format=TJPF_GRAY,
+                        jpeg_subsample=TJSAMP_GRAY,
+                    )
+                return _TURBOJPEG.encode(
+                    np.asarray(image), quality=self.JPEG_QUALITY, pixel_format=TJPF_RGB
+                )
+            
+            buffer = getattr(_tls, "buffer", None)
+            if buffer is None:
+                buffer = _tls.buffer = BytesIO()
+            # Overwrite from the start; the buffer keeps its largest size
+            buffer.seek(0)
+            image.save(buffer, format="JPEG", quality=self.JPEG_QUALITY, optimize=True)
+            with buffer.getbuffer() as view:
+                return bytes(view[:buffer.tell()])
+        finally:
+            # Release intermediate copies; the caller owns the original
+            if image is not original:
+                image.close()
     
-    def _image_to_base64(self, image: Image.Image) -> str:
-        """Convert PIL Image to base64 string (PNG)."""
-        buffer = BytesIO()
-        # Convert to RGB if necessary (handles RGBA, P mode, etc.)
-        if image.mode not in ('RGB', 'L'):
-            image = image.convert('RGB')
-        image.save(buffer, format="PNG")
-        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    def _build_message(self, image_bytes: bytes) -> HumanMessage:
+        """Build the OCR prompt message for one encoded image."""
+        # A base64 data block is handed to Ollama's images field as is;
+        # an image_url would first be built into a data URL and then split
+        # apart again by langchain_ollama, copying the payload twice
+        return HumanMessage(
+            content=[
+                {
+                    "type": "image",
+                    "source_type": "base64",
+                    "mime_type": "image/jpeg",
+                    "data": base64.b64encode(image_bytes).decode("ascii"),
+                },
+                {"type": "text", "text": self.OCR_INSTRUCTION},
+            ]
+        )
     
     def extract_text(self, image: Image.Image) -> str:
         """
@@ -54,53 +141,64 @@ class OCRService:
         Returns:
             Extracted text string
         """
-        img_b64 = self._image_to_base64(image)
-        
-        message = HumanMessage(
-            content=[
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{img_b64}"
-                    },
-                },
-                {"type": "text", "text": self.OCR_INSTRUCTION},
-            ]
-        )
-        
-        response = self.llm.invoke([message])
-        return response.content
+        return self.extract_text_batch([image])[0]
+    
+    @staticmethod
+    def _is_complete(resp) -> bool:
+        """Whether a model reply has text and was not cut off."""
+        done_reason = (getattr(resp, "response_metadata", None) or {}).get("done_reason")
+        return bool(resp.content and resp.content.strip()) and done_reason in (None, "stop")
     
-    def extract_text_batch(self, images: List[Image.Image]) -> List[str]:
+    def extract_text_batch(
+        self,
+        images: List[Image.Image],
+        max_concurrency: Optional[int] = None
+    ) -> List[str]:
         """
         Extract text from multiple images in batch.
         
+        Pages already in the OCR cache are answered from it; only the
+        rest are sent to the model.
+        
         Args:
             images: List of PIL Image objects
+            max_concurrency: Maximum concurrent requests to Ollama (default: unbounded)
             
         Returns:
             List of extracted text strings
         """
-        messages = []
-        for image in images:
-            img_b64 = self._image_to_base64(image)
-            messages.append(
-                HumanMessage(
-                    content=[
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{img_b64}"
-                            },
-                        },
-                        {"type": "text", "text": self.OCR_INSTRUCTION},
-                    ]
-                )
-            )
+        encoded = [self._encode_image(image) for image in images]
+        
+        if self.cache:
+            keys = [self.cache.key(image_bytes) for image_bytes in encoded]
+            texts = self.cache.get_many(keys)
+        else:
+            keys = []
+            texts = [None] * len(encoded)
+        
+        misses = [i for i, text in enumerate(texts) if text is None]
+        if not misses:
+            return texts
+        
+        messages = [[self._build_message(encoded[i])] for i in misses]
+        if len(messages) == 1:
+            responses = [self.llm.invoke(messages[0])]
+        else:
+            config = {"max_concurrency": max_concurrency} if max_concurrency else None
+            responses = self.llm.batch(messages, config=config)
+        
+        complete = []
+        for i, resp in zip(misses, responses):
+            texts[i] = resp.content
+            if self._is_complete(resp):
+                complete.append(i)
+        
+        # Empty or cut-off replies are returned but not cached, so
+        # re-ingesting the document retries those pages
+        if self.cache and complete:
+            self.cache.put_many([keys[i] for i in complete], [texts[i] for i in complete])
         
-        # Batch process all images
-        responses = self.llm.batch([[msg] for msg in messages])
-        return [resp.content for resp in responses]
+        return texts
     
     def extract_text_from_path(self, image_path: str) -> str:
         """
@@ -0,0 +1,106 @@
+"""
+Batch ingestion driver for many files.
+Each file is loaded, OCR'd and chunked in a worker process; embedding and
+indexing stay in the calling process, which owns the vector store.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from .loader import PDFLoader, ImageLoader
+from .ocr_service import OCRService
+from .processor import SemanticTextProcessor
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp")
+SUPPORTED_SUFFIXES = (".pdf",) + IMAGE_SUFFIXES
+
+# Services owned by each worker process, created once by _init_worker
+_ocr_service: Optional[OCRService] = None
+_processor: Optional[SemanticTextProcessor] = None
+
+
+def load_file(
+    path: str,
+    ocr_service: OCRService,
+    processor: SemanticTextProcessor,
+    source: Optional[str] = None
+) -> List[Document]:
+    """
+    Load a PDF or image file and split it into chunks.
+    
+    Args:
+        path: Path to the file
+        ocr_service: OCR service for scanned pages and images
+        processor: Text processor used for chunking
+        source: Source name for metadata (default: file name)
+    
+    Returns:
+        List of Document chunks
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        raw_texts = PDFLoader(ocr_service=ocr_service).load(path)
+    elif suffix in IMAGE_SUFFIXES:
+        raw_texts = ImageLoader(ocr_service=ocr_service).load(path)
+    else:
+        raise ValueError(f"Unsupported file type: {suffix}")
+    
+    return processor.process(raw_texts, source=source or Path(path).name)
+
+
+def _init_worker():
+    """Create the per-process OCR service and text processor."""
+    global _ocr_service, _processor
+    _ocr_service = OCRService()
+    _processor = SemanticTextProcessor()
+
+
+def _ingest_one(path: str) -> List[Document]:
+    """Worker entry point: load and chunk one file."""
+    return load_file(path, _ocr_service, _processor)
+
+
+def ingest_files(
+    paths: List[str],
+    vector_store,
+    max_workers: Optional[int] = None
+) -> int:
+    """
+    Load and chunk files in parallel, then index them.
+    
+    Files are partitioned across worker processes; chunks are added to
+    the vector store in the calling process as each file finishes, in
+    input order. Files that fail are reported and skipped.
+    
+    Args:
+        paths: Paths of PDF or image files
+        vector_store: VectorStore the chunks are added to
+        max_workers: Worker processes (default: CPU count)
+    
+    Returns:
+        Number of chunks indexed
+    """
+    if not paths:
+        return 0
+    
+    max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    indexed = 0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        futures = [(path, executor.submit(_ingest_one, path)) for path in paths]
+        for path, future in futures:
+            try:
+                documents = future.result()
+            except Exception as e:
+                print(f"[Ingest] Failed to process {path}: {e}")
+                continue
+            
+            vector_store.add_documents(documents)
+            indexed += len(documents)
+            print(f"[Ingest] Indexed {len(documents)} chunks from {path}")
+    
+    # add_documents defers saves; persist whatever is left
+    vector_store.flush()
+    return indexed
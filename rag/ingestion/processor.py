@@ -6,12 +6,75 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from config import CHUNK_SIZE, CHUNK_OVERLAP
+import bisect
 import re
+from collections import Counter
 from typing import List, Optional
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 
+class LiteralSeparatorSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter for plain-string separators.
+    
+    Separators are located with `in` and split with str.split instead of
+    being escaped, compiled and run through re.split at every level of
+    the recursion; chunk boundaries are the same as the base class.
+    """
+    
+    def _split_on(self, text: str, separator: str) -> List[str]:
+        """Split on a literal separator, keeping it like the base class does."""
+        if not separator:
+            return list(text)
+        
+        parts = text.split(separator)
+        if self._keep_separator == "end":
+            splits = [part + separator for part in parts[:-1]] + parts[-1:]
+        elif self._keep_separator:
+            splits = parts[:1] + [separator + part for part in parts[1:]]
+        else:
+            splits = parts
+        return [split for split in splits if split != ""]
+    
+    def _split_text(self, text: str, separators: List[str]) -> List[str]:
+        """Split text recursively, trying separators in order of preference."""
+        if self._is_separator_regex:
+            return super()._split_text(text, separators)
+        
+        # Use the first separator present in the text
+        separator = separators[-1]
+        new_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if candidate in text:
+                separator = candidate
+                new_separators = separators[i + 1:]
+                break
+        
+        final_chunks = []
+        good_splits = []
+        merge_separator = "" if self._keep_separator else separator
+        for split in self._split_on(text, separator):
+            if self._length_function(split) < self._chunk_size:
+                good_splits.append(split)
+                continue
+            
+            # Too long: flush what we have, then recurse with finer separators
+            if good_splits:
+                final_chunks.extend(self._merge_splits(good_splits, merge_separator))
+                good_splits = []
+            if new_separators:
+                final_chunks.extend(self._split_text(split, new_separators))
+            else:
+                final_chunks.append(split)
+        
+        if good_splits:
+            final_chunks.extend(self._merge_splits(good_splits, merge_separator))
+        return final_chunks
+
 
 class SemanticTextProcessor:
     """
@@ -19,6 +82,11 @@ class SemanticTextProcessor:
     Uses sentence and paragraph boundaries for better coherence.
     """
     
+    _BLANK_LINES_RE = re.compile(r'\n{3,}')
+    
+    # Joins pages before splitting; the splitter's first separator
+    PAGE_SEPARATOR = "\n\n"
+    
     def __init__(
         self, 
         chunk_size: Optional[int] = None, 
@@ -41,7 +109,7 @@ class SemanticTextProcessor:
         # 4. Semicolons and colons
         # 5. Commas
         # 6. Spaces
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = LiteralSeparatorSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             separators=[
@@ -72,21 +140,20 @@ class SemanticTextProcessor:
         if not text:
             return ""
         
-        # Remove excessive whitespace while keeping paragraph breaks
-        # First, normalize line endings
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        # Normalize line endings (skipped entirely for text without \r)
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
         
-        # Remove excessive blank lines (more than 2 consecutive)
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        # Remove trailing whitespace from each line, so whitespace-only
+        # lines count as blank below
+        text = '\n'.join(map(str.rstrip, text.split('\n')))
         
-        # Remove trailing whitespace from each line
-        lines = [line.rstrip() for line in text.split('\n')]
-        text = '\n'.join(lines)
+        # Remove excessive blank lines (more than 2 consecutive)
+        if '\n\n\n' in text:
+            text = self._BLANK_LINES_RE.sub('\n\n', text)
         
         # Remove leading/trailing whitespace from the entire text
-        text = text.strip()
-        
-        return text
+        return text.strip()
     
     def _extract_title_or_header(self, text: str) -> Optional[str]:
         """
@@ -115,6 +182,9 @@ class SemanticTextProcessor:
         """
         Process raw text pages into semantic chunks with metadata.
         
+        Pages are joined and split in one pass, so chunks can run across
+        page breaks; each chunk is attributed to the page it starts on.
+        
         Args:
             raw_texts: List of text strings (e.g., pages from a document)
             source: Source filename for metadata
@@ -123,7 +193,11 @@ class SemanticTextProcessor:
         Returns:
             List of Document objects with metadata
         """
-        documents = []
+        # Page metadata and the offset where each page starts in the joined text
+        page_starts = []
+        page_metadata = []
+        pages = []
+        offset = 0
         
         for page_num, text in enumerate(raw_texts, start=1):
             clean_content = self.clean_text(text)
@@ -142,18 +216,50 @@ class SemanticTextProcessor:
             if header:
                 base_metadata["section"] = header
             
-            # Split into semantic chunks
-            chunks = self.text_splitter.create_documents(
-                [clean_content],
-                metadatas=[base_metadata]
+            page_starts.append(offset)
+            page_metadata.append(base_metadata)
+            pages.append(clean_content)
+            offset += len(clean_content) + len(self.PAGE_SEPARATOR)
+        
+        if not pages:
+            return []
+        
+        # Split into semantic chunks; page breaks read as paragraph breaks
+        full_text = self.PAGE_SEPARATOR.join(pages)
+        chunks = self.text_splitter.split_text(full_text)
+        
+        # Map each chunk back to the page containing its start offset
+        chunk_pages = []
+        search_from = 0
+        for chunk in chunks:
+            start = full_text.find(chunk, search_from)
+            if start == -1:
+                start = search_from
+            chunk_pages.append(bisect.bisect_right(page_starts, start) - 1)
+            # The next chunk shares at most chunk_overlap characters with
+            # this one, so search past the rest (as LangChain's
+            # add_start_index does); searching from start + 1 would match
+            # repeated text, like running headers, inside this chunk
+            search_from = max(start + 1, start + len(chunk) - self.chunk_overlap)
+        
+        # Add chunk index within page
+        page_chunk_counts = Counter(chunk_pages)
+        documents = []
+        chunk_idx = 0
+        for i, (chunk, page_idx) in enumerate(zip(chunks, chunk_pages)):
+            if i == 0 or page_idx != chunk_pages[i - 1]:
+                chunk_idx = 0
+            documents.append(
+                Document(
+                    page_content=chunk,
+                    metadata={
+                        **page_metadata[page_idx],
+                        "chunk_index": chunk_idx,
+                        "total_chunks_in_page": page_chunk_counts[page_idx],
+                    },
+                )
             )
-            
-            # Add chunk index within page
-            for chunk_idx, chunk in enumerate(chunks):
-                chunk.metadata["chunk_index"] = chunk_idx
-                chunk.metadata["total_chunks_in_page"] = len(chunks)
-            
-            documents.extend(chunks)
+            chunk_idx += 1
         
         return documents
     
@@ -1,3 +1,4 @@
 from .vector_store import VectorStore
+from .embedding_cache import EmbeddingCache
 
-__all__ = ["VectorStore"]
+__all__ = ["VectorStore", "EmbeddingCache"]
@@ -0,0 +1,98 @@
+"""
+Persistent embedding cache backed by SQLite.
+Embeddings are keyed on a SHA-256 of the model name and text, so they
+survive restarts and are shared across sessions.
+"""
+import hashlib
+import sqlite3
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of float32 embeddings.
+    """
+    
+    def __init__(self, db_path: str, model_name: str):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            db_path: Path to the SQLite file
+            model_name: Embedding model name, mixed into every key
+        """
+        self.db_path = db_path
+        self.model_name = model_name or ""
+        # Model prefix hashed once; each key copies this state and hashes
+        # the whole text in a single update() call
+        self._key_prefix = hashlib.sha256(f"{self.model_name}\0".encode("utf-8"))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS emb_cache (sha TEXT PRIMARY KEY, dim INT, vec BLOB)"
+        )
+        self._conn.commit()
+    
+    def key(self, text: str) -> str:
+        """Cache key for a text under the current model."""
+        digest = self._key_prefix.copy()
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up the embedding for a text.
+        
+        Returns:
+            Embedding, or None if not cached
+        """
+        return self.get_many([text])[0]
+    
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for several texts.
+        
+        Returns:
+            One embedding (or None if not cached) per text
+        """
+        keys = [self.key(text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT sha, vec FROM emb_cache WHERE sha IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+        
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+    
+    def put(self, text: str, embedding: List[float]):
+        """Store the embedding for a text."""
+        self.put_many([text], [embedding])
+    
+    def put_many(self, texts: List[str], embeddings: List[List[float]]):
+        """Store embeddings for several texts."""
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            vec = np.asarray(embedding, dtype=np.float32)
+            rows.append((self.key(text), len(vec), vec.tobytes()))
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO emb_cache (sha, dim, vec) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
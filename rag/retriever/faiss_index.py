@@ -0,0 +1,148 @@
+"""
+FAISS indexes used by VectorStore.
+Embeddings are L2-normalized and searched by inner product, so scores are
+cosine similarities. Small corpora use an exact flat index (IndexFlatIP);
+large ones move onto an HNSW graph built from it. Either can store vectors
+as 8-bit scalar codes (SQ8), a quarter of the float32 size.
+"""
+from typing import Optional
+
+import faiss
+import numpy as np
+
+# Read flags that memory-map the vectors of flat and HNSW indexes, so a
+# loaded index is served from the OS page cache; faiss builds without
+# IO_FLAG_MMAP_IFC read the index into memory
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+# HNSW graph parameters
+HNSW_M = 32  # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200  # Candidate list size while building
+HNSW_EF_SEARCH = 64  # Candidate list size while searching
+
+
+def set_num_threads(num_threads: Optional[int]):
+    """
+    Set the OpenMP threads FAISS uses for graph builds and batched search.
+    
+    This is process-wide; None leaves the OpenMP default in place.
+    """
+    if num_threads:
+        faiss.omp_set_num_threads(max(1, num_threads))
+
+
+def normalize(vectors) -> np.ndarray:
+    """
+    L2-normalize embeddings into a new C-contiguous float32 matrix.
+    
+    Args:
+        vectors: One embedding, or a sequence of embeddings
+    
+    Returns:
+        (n, d) float32 matrix of unit-length rows
+    """
+    vectors = np.array(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _train_unit_range(index: faiss.Index):
+    """
+    Fix an SQ8 index's range to [-1, 1] in every dimension.
+    
+    That range holds any normalized vector, so no data is needed to train
+    and vectors added later are never clipped. One step is 2/255, which
+    keeps cosine errors around 0.002. All SQ8 indexes share this range,
+    so re-encoding vectors decoded from one is lossless.
+    """
+    ones = np.ones(index.d, dtype=np.float32)
+    index.train(np.stack([-ones, ones]))
+
+
+def new_flat_index(dim: int, quantize: bool = False) -> faiss.Index:
+    """
+    Empty exact inner-product index.
+    
+    Args:
+        dim: Embedding dimension
+        quantize: Store vectors as 8-bit scalar codes
+    
+    Returns:
+        IndexScalarQuantizer if quantized, else IndexFlatIP
+    """
+    if quantize:
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        _train_unit_range(index)
+        return index
+    return faiss.IndexFlatIP(dim)
+
+
+def is_hnsw(index: faiss.Index) -> bool:
+    """Whether an index is an HNSW graph."""
+    return isinstance(index, faiss.IndexHNSW)
+
+
+def build_hnsw_index(vectors: np.ndarray, quantize: bool = False) -> faiss.Index:
+    """
+    Build an HNSW graph over normalized vectors.
+    
+    Args:
+        vectors: (n, d) float32 matrix of unit-length rows
+        quantize: Store vectors as 8-bit scalar codes
+    
+    Returns:
+        IndexHNSWSQ if quantized, else IndexHNSWFlat
+    """
+    dim = vectors.shape[1]
+    if quantize:
+        index = faiss.IndexHNSWSQ(
+            dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        _train_unit_range(index)
+    else:
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    index.add(vectors)
+    return index
+
+
+def to_inner_product(index: faiss.Index) -> faiss.Index:
+    """
+    Return a cosine-searchable version of an index.
+    
+    Inner-product indexes are returned as is. Older saves used IndexFlatL2
+    over raw embeddings; those are rebuilt as IndexFlatIP over the
+    normalized vectors.
+    """
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return index
+    flat_index = new_flat_index(index.d)
+    if index.ntotal:
+        flat_index.add(normalize(index.reconstruct_n(0, index.ntotal)))
+    return flat_index
+
+
+def read_index(path: str) -> tuple[faiss.Index, bool]:
+    """
+    Read an index written by faiss.write_index.
+    
+    Args:
+        path: Index file path
+    
+    Returns:
+        Tuple of (index, whether its vectors are memory-mapped). A mapped
+        index is read-only; copy_index() it before adding vectors.
+    """
+    if MMAP_FLAGS:
+        return faiss.read_index(path, MMAP_FLAGS | faiss.IO_FLAG_READ_ONLY), True
+    return faiss.read_index(path), False
+
+
+def copy_index(index: faiss.Index) -> faiss.Index:
+    """In-memory, writable copy of an index (e.g. a memory-mapped one)."""
+    return faiss.deserialize_index(faiss.serialize_index(index))
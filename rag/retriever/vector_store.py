@@ -2,11 +2,19 @@
 Vector store using FAISS for document embeddings.
 Supports Ollama embeddings and sentence-transformers fallback.
 """
+import atexit
 import os
 import pickle
-from typing import List, Optional
+import functools
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 
 # Try Ollama embeddings first, fall back to sentence-transformers
 try:
@@ -24,15 +32,56 @@ except ImportError:
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from config import CHROMA_PERSIST_DIR, CHROMA_COLLECTION_NAME, EMBEDDING_MODEL, RETRIEVAL_K
+from config import (
+    CHROMA_PERSIST_DIR,
+    CHROMA_COLLECTION_NAME,
+    EMBEDDING_MODEL,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_NUM_THREAD,
+    EMBEDDING_CACHE_SIZE,
+    PERSIST_EMBEDDING_CACHE,
+    EMBEDDING_CACHE_PATH,
+    HNSW_THRESHOLD,
+    SAVE_EVERY_VECTORS,
+    FAISS_THREADS,
+    QUANTIZE_EMBEDDINGS,
+    RETRIEVAL_K,
+)
+from rag.retriever.faiss_index import (
+    normalize,
+    new_flat_index,
+    build_hnsw_index,
+    is_hnsw,
+    to_inner_product,
+    read_index,
+    copy_index,
+    set_num_threads,
+)
+from rag.retriever.embedding_cache import EmbeddingCache
 
 # Rename for FAISS context
 FAISS_PERSIST_DIR = CHROMA_PERSIST_DIR.replace("chroma", "faiss") if "chroma" in CHROMA_PERSIST_DIR else CHROMA_PERSIST_DIR
 
 
+def _flush_at_exit(store_ref: "weakref.ref[VectorStore]"):
+    """Save unsaved vectors of a still-live VectorStore at interpreter exit."""
+    store = store_ref()
+    if store is not None:
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"Could not save index at exit: {e}")
+
+
 class VectorStore:
     """
     FAISS vector store wrapper for document embeddings.
+    
+    The FAISS index is the only copy of the vectors: an exact IndexFlatIP
+    over normalized embeddings (IndexScalarQuantizer when quantized),
+    replaced by an HNSW graph built from it once the corpus reaches
+    HNSW_THRESHOLD chunks. A loaded index keeps the storage it was saved with.
     """
     
     def __init__(
@@ -40,7 +89,8 @@ class VectorStore:
         persist_directory: Optional[str] = None,
         index_name: Optional[str] = None,
         embedding_model: Optional[str] = None,
-        use_ollama: bool = True
+        use_ollama: bool = True,
+        quantize: Optional[bool] = None
     ):
         """
         Initialize the vector store.
@@ -50,21 +100,50 @@ class VectorStore:
             index_name: Name of the FAISS index
             embedding_model: Model name for embeddings
             use_ollama: Whether to use Ollama embeddings (False = HuggingFace)
+            quantize: Store new indexes as 8-bit codes (default: from config)
         """
         self.persist_directory = persist_directory or FAISS_PERSIST_DIR
         self.index_name = index_name or CHROMA_COLLECTION_NAME
         self.embedding_model = embedding_model or EMBEDDING_MODEL
+        self.quantize = QUANTIZE_EMBEDDINGS if quantize is None else quantize
+        
+        # FAISS parallelizes HNSW builds and batched search with OpenMP
+        set_num_threads(FAISS_THREADS)
         
         # Initialize embeddings
         self.embeddings = self._get_embeddings(use_ollama)
         
-        # Initialize or load FAISS
+        # Persistent embedding caches, shared across restarts and sessions
+        self._query_cache, self._document_cache = self._init_embedding_caches()
+        
+        # Memoize query embeddings so repeated questions (and retries)
+        # skip the embedding round-trip
+        self._embed_query = functools.lru_cache(maxsize=EMBEDDING_CACHE_SIZE)(
+            self._embed_query_uncached
+        )
+        
+        # Initialize or load FAISS; a loaded index may be memory-mapped
+        self._index_mapped = False
         self.vectorstore = self._init_vectorstore()
+        
+        # Guards the indexes: documents may be added on a background
+        # thread while other threads search
+        self._lock = threading.RLock()
+        
+        # Vectors added since the last save; add_documents defers saving
+        # until SAVE_EVERY_VECTORS accumulate, flush() writes the rest
+        self._unsaved = 0
+        atexit.register(_flush_at_exit, weakref.ref(self))
     
     def _get_embeddings(self, use_ollama: bool):
         """Get embedding function based on availability and preference."""
         if use_ollama and OLLAMA_AVAILABLE:
-            return OllamaEmbeddings(model=self.embedding_model)
+            if not self.embedding_model:
+                raise ValueError(
+                    "EMBEDDING_MODEL is not set. "
+                    "Set it in .env or pass embedding_model explicitly."
+                )
+            return OllamaEmbeddings(model=self.embedding_model, num_thread=EMBEDDING_NUM_THREAD)
         elif HF_AVAILABLE:
             return HuggingFaceEmbeddings(
                 model_name="sentence-transformers/all-MiniLM-L6-v2"
@@ -75,6 +154,29 @@ class VectorStore:
                 "Install langchain-ollama or sentence-transformers."
             )
     
+    def _init_embedding_caches(self) -> tuple[Optional[EmbeddingCache], Optional[EmbeddingCache]]:
+        """Open the SQLite embedding caches for queries and documents."""
+        if not PERSIST_EMBEDDING_CACHE:
+            return None, None
+        
+        db_path = EMBEDDING_CACHE_PATH
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        model_name = (
+            getattr(self.embeddings, "model", None)
+            or getattr(self.embeddings, "model_name", None)
+            or self.embedding_model
+        )
+        
+        try:
+            # Models may embed queries and documents differently, so key them apart
+            return (
+                EmbeddingCache(db_path, f"{model_name}/query"),
+                EmbeddingCache(db_path, f"{model_name}/document"),
+            )
+        except Exception as e:
+            print(f"Could not open embedding cache: {e}")
+            return None, None
+    
     def _get_index_path(self) -> str:
         """Get the full path for the FAISS index."""
         return os.path.join(self.persist_directory, self.index_name)
@@ -88,20 +190,43 @@ class VectorStore:
         # Try to load existing index
         if os.path.exists(f"{index_path}.faiss"):
             try:
-                return FAISS.load_local(
-                    index_path, 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
+                # Same files as FAISS.load_local, but the index is read
+                # with memory-mapped vectors instead of into memory
+                index, mapped = read_index(f"{index_path}.faiss")
+                with open(f"{index_path}.pkl", "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+                
+                cosine_index = to_inner_product(index)
+                self._index_mapped = mapped and cosine_index is index
+                return FAISS(
+                    embedding_function=self.embeddings,
+                    index=cosine_index,
+                    docstore=docstore,
+                    index_to_docstore_id=index_to_docstore_id,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
                 )
             except Exception as e:
                 print(f"Could not load existing index: {e}")
         
         return None
     
+    def _new_vectorstore(self, dim: int) -> FAISS:
+        """Create an empty FAISS store scored by inner product."""
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=new_flat_index(dim, quantize=self.quantize),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+    
     def add_documents(self, documents: List[Document]) -> List[str]:
         """
         Add documents to the vector store.
         
+        The index is saved once SAVE_EVERY_VECTORS vectors have been added
+        since the last save; call flush() to persist the remainder.
+        
         Args:
             documents: List of LangChain Document objects
             
@@ -111,23 +236,155 @@ class VectorStore:
         if not documents:
             return []
         
-        if self.vectorstore is None:
-            # Create new index with first batch
-            self.vectorstore = FAISS.from_documents(documents, self.embeddings)
-        else:
-            # Add to existing index
-            self.vectorstore.add_documents(documents)
+        # Embed up front and insert with explicit embeddings
+        self._add_batch(documents)
         
-        # Persist the index
-        self._save()
+        # Persist once enough vectors have accumulated
+        if self._unsaved >= SAVE_EVERY_VECTORS:
+            self._save()
         
         # Generate IDs (FAISS doesn't return IDs by default)
         return [f"doc_{i}" for i in range(len(documents))]
     
+    def add_documents_batched(
+        self,
+        documents: List[Document],
+        batch_size: int = 200,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[str]:
+        """
+        Add documents in fixed-size batches and persist once at the end.
+        
+        Each batch is embedded up front and inserted with its
+        precomputed embeddings.
+        
+        Args:
+            documents: List of LangChain Document objects
+            batch_size: Number of documents per insert
+            progress_callback: Optional callback called as (done, total) after each batch
+            
+        Returns:
+            List of document IDs
+        """
+        if not documents:
+            return []
+        
+        total = len(documents)
+        for start in range(0, total, batch_size):
+            self._add_batch(documents[start:start + batch_size])
+            if progress_callback:
+                progress_callback(min(start + batch_size, total), total)
+        
+        # Persist the index once for the whole upload
+        self.flush()
+        
+        return [f"doc_{i}" for i in range(total)]
+    
+    def _embed_query_uncached(self, query: str) -> List[float]:
+        """Embed a query, going through the persistent cache if enabled."""
+        if self._query_cache is None:
+            return self.embeddings.embed_query(query)
+        
+        embedding = self._query_cache.get(query)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+            self._query_cache.put(query, embedding)
+        return embedding
+    
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only sending those missing from the persistent cache."""
+        if self._document_cache is None:
+            return self._embed_documents_uncached(texts)
+        
+        embeddings = self._document_cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = self._embed_documents_uncached(missing_texts)
+            self._document_cache.put_many(missing_texts, new_embeddings)
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+        return embeddings
+    
+    def _embed_documents_uncached(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts in EMBEDDING_BATCH_SIZE slices.
+        
+        Each slice is one embed_documents request; up to
+        EMBEDDING_CONCURRENCY slices are in flight at once.
+        """
+        batches = [
+            texts[start:start + EMBEDDING_BATCH_SIZE]
+            for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+        ]
+        if len(batches) <= 1 or EMBEDDING_CONCURRENCY <= 1:
+            return [emb for batch in batches for emb in self.embeddings.embed_documents(batch)]
+        
+        # map() keeps results in input order
+        with ThreadPoolExecutor(max_workers=min(EMBEDDING_CONCURRENCY, len(batches))) as executor:
+            results = executor.map(self.embeddings.embed_documents, batches)
+            return [emb for batch in results for emb in batch]
+    
+    def _add_batch(self, documents: List[Document]):
+        """Embed a batch of documents and insert it into the index."""
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        vectors = normalize(self._embed_documents(texts))
+        text_embeddings = list(zip(texts, vectors))
+        
+        # Embedding is the slow part and stays outside the lock; searches
+        # only wait for the insert itself
+        with self._lock:
+            if self.vectorstore is None:
+                # Create new index with first batch
+                self.vectorstore = self._new_vectorstore(vectors.shape[1])
+            elif self._index_mapped:
+                # The loaded index is mapped read-only; copy it into memory
+                # on the first add
+                self.vectorstore.index = copy_index(self.vectorstore.index)
+                self._index_mapped = False
+            self.vectorstore.add_embeddings(text_embeddings, metadatas=metadatas)
+            
+            # Move onto an HNSW graph once the corpus crosses the threshold;
+            # the flat index is dropped, so vectors are never held twice
+            index = self.vectorstore.index
+            if not is_hnsw(index) and index.ntotal >= HNSW_THRESHOLD:
+                self.vectorstore.index = build_hnsw_index(
+                    index.reconstruct_n(0, index.ntotal), quantize=self.quantize
+                )
+            
+            self._unsaved += len(documents)
+    
     def _save(self):
         """Save the FAISS index to disk."""
-        if self.vectorstore:
-            self.vectorstore.save_local(self._get_index_path())
+        with self._lock:
+            if self.vectorstore:
+                # Write into a temp dir and move into place, so a crash mid-save
+                # never leaves a truncated index behind
+                index_path = self._get_index_path()
+                with tempfile.TemporaryDirectory(dir=self.persist_directory) as tmpdir:
+                    self.vectorstore.save_local(tmpdir, index_name=self.index_name)
+                    for ext in (".faiss", ".pkl"):
+                        os.replace(os.path.join(tmpdir, f"{self.index_name}{ext}"), f"{index_path}{ext}")
+            self._unsaved = 0
+    
+    def flush(self):
+        """Persist any vectors added since the last save."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query string, reusing cached embeddings for repeated queries.
+        
+        Args:
+            query: Query string
+            
+        Returns:
+            Embedding vector
+        """
+        return self._embed_query(query)
     
     def similarity_search(
         self, 
@@ -148,7 +405,11 @@ class VectorStore:
             return []
         
         k = k or RETRIEVAL_K
-        return self.vectorstore.similarity_search(query, k=k)
+        query_embedding = normalize(self.embed_query(query))[0]
+        with self._lock:
+            if self.vectorstore is None:
+                return []
+            return self.vectorstore.similarity_search_by_vector(query_embedding, k=k)
     
     def similarity_search_with_score(
         self, 
@@ -163,13 +424,17 @@ class VectorStore:
             k: Number of results to return
             
         Returns:
-            List of (Document, score) tuples
+            List of (Document, cosine similarity) tuples, best first
         """
         if self.vectorstore is None:
             return []
         
         k = k or RETRIEVAL_K
-        return self.vectorstore.similarity_search_with_score(query, k=k)
+        query_embedding = normalize(self.embed_query(query))[0]
+        with self._lock:
+            if self.vectorstore is None:
+                return []
+            return self.vectorstore.similarity_search_with_score_by_vector(query_embedding, k=k)
     
     def as_retriever(self, **kwargs):
         """
@@ -203,16 +468,30 @@ class VectorStore:
         }
     
     def clear(self):
-        """Clear all documents from the index."""
-        import shutil
+        """
+        Clear all documents from the index.
         
-        index_path = self._get_index_path()
+        The persistent embedding cache is content-addressed and kept.
+        """
+        import shutil
         
-        # Remove index files
-        for ext in [".faiss", ".pkl"]:
-            path = f"{index_path}{ext}"
-            if os.path.exists(path):
-                os.remove(path)
+        with self._lock:
+            # Reset vectorstore first: a memory-mapped index keeps its file
+            # mapped, and Windows cannot delete a mapped file
+            self.vectorstore = None
+            self._index_mapped = False
+            self._unsaved = 0
+            
+            # Remove index files
+            index_path = self._get_index_path()
+            for ext in [".faiss", ".pkl"]:
+                path = f"{index_path}{ext}"
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    # Another store on the same directory may still map it
+                    print(f"Could not remove {path}: {e}")
         
-        # Reset vectorstore
-        self.vectorstore = None
+        # Drop cached query embeddings
+        self._embed_query.cache_clear()
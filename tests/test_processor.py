@@ -0,0 +1,53 @@
+"""
+Tests for text chunking: the literal-separator splitter and page mapping.
+"""
+import random
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from rag.ingestion.processor import LiteralSeparatorSplitter, SemanticTextProcessor
+
+SEPARATORS = ["\n\n", "\n", ". ", "! ", "? ", "; ", ": ", ", ", " ", ""]
+
+# Separators, their fragments and words, so splits land in every position
+TOKENS = SEPARATORS[:-1] + [".", "!", ",", "a", "bb", "word", "longerword", "0123456789"]
+
+
+def test_chunk_repeated_in_previous_chunk_keeps_its_page():
+    # "2024 summary" also ends page 1's last chunk, like a running header
+    processor = SemanticTextProcessor(chunk_size=25, chunk_overlap=5)
+    documents = processor.process(
+        ["Totals are in table one.\n\nSee the 2024 summary", "2024 summary", "Page three text"],
+        "r.pdf",
+    )
+    
+    pages = [(doc.page_content, doc.metadata["page"]) for doc in documents]
+    assert pages == [
+        ("Totals are in table one.", 1),
+        ("See the 2024 summary", 1),
+        ("2024 summary", 2),
+        ("Page three text", 3),
+    ]
+
+
+@pytest.mark.parametrize("keep_separator", [True, False, "start", "end"])
+def test_literal_splitter_matches_regex_splitter(keep_separator):
+    # LiteralSeparatorSplitter overrides private base-class methods; this
+    # catches langchain-text-splitters changes that would make it diverge
+    rng = random.Random(0)
+    for _ in range(3000):
+        chunk_size = rng.randint(2, 60)
+        kwargs = dict(
+            chunk_size=chunk_size,
+            chunk_overlap=rng.randint(0, chunk_size // 2),
+            separators=SEPARATORS,
+            keep_separator=keep_separator,
+        )
+        text = "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 80)))
+        
+        expected = RecursiveCharacterTextSplitter(**kwargs).split_text(text)
+        assert LiteralSeparatorSplitter(**kwargs).split_text(text) == expected, (kwargs, text)